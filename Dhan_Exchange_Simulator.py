@@ -0,0 +1,1180 @@
+#==================================#
+### 0.0     Dhan Exchange Simulator
+#==================================#
+# Local stand-in for the parts of Dhan that Intraday_Trend_and_Scalping_System.py
+# talks to, so the whole system can be run and benchmarked with no network:
+#
+#   REST (http://<host>:<rest_port>)
+#     POST   /v2/super/orders                    place super order (ENTRY + STOP_LOSS + TARGET legs)
+#     PUT    /v2/super/orders/{orderId}          modify a super-order leg
+#     DELETE /v2/super/orders/{orderId}/{leg}    cancel ENTRY_LEG / STOP_LOSS_LEG / TARGET_LEG
+#     GET    /v2/super/orders                    super order book
+#     POST   /v2/orders                          place normal order (LIMIT / MARKET / STOP_LOSS / STOP_LOSS_MARKET)
+#     PUT    /v2/orders/{orderId}                modify normal order
+#     DELETE /v2/orders/{orderId}                cancel normal order
+#     GET    /v2/orders, /v2/orders/{orderId}    order book / single order (also resolves super-order legs)
+#     GET    /v2/positions                       positions
+#     POST   /v2/marketfeed/ltp                  LTP snapshot
+#     POST   /v2/charts/intraday                 minute candles of the underlying (dhanhq intraday_minute_data)
+#     GET    /api-data/api-scrip-master-detailed.csv   synthetic scrip master (underlying + one weekly chain)
+#     GET    /sim/stats, POST /sim/price, POST /sim/config   simulator control
+#
+#   Feed (ws://<host>:<feed_port>)
+#     Dhan v2 JSON subscribe / unsubscribe requests in; binary Ticker packets out
+#     (header <BHBI FeedCode=2, MsgLen, Segment, SecurityId + <fI LTP, LTT).
+#
+# Prices follow one path for the underlying (seeded random walk or a replayed
+# CSV of closes); option prices are derived from it (intrinsic + decaying time
+# value). Every price step runs the matching engine, so orders fill, trigger
+# and close exactly as the feed the strategy sees would suggest.
+#
+# Run:
+#   python Dhan_Exchange_Simulator.py --rest-port 8800 --feed-port 8801 --tick-interval 0.1 \
+#          --rest-latency-ms 15 --reject-rate 0.02 --partial-fill-rate 0.3
+# (MCX: --exchange MCX --underlying CRUDEOILM --underlying-id <id> --underlying-instrument FUTCOM
+#       --underlying-segment MCX_COMM --option-segment MCX_COMM --start-price 5400 --lot-size 1
+#       --session 09:00-23:30; MCX quantities are in lots)
+# and start the system with:
+#   DHAN_API_BASE=http://127.0.0.1:8800 DHAN_FEED_URL=ws://127.0.0.1:8801 \
+#   DHAN_SCRIP_MASTER_URL=http://127.0.0.1:8800/api-data/api-scrip-master-detailed.csv \
+#   python Intraday_Trend_and_Scalping_System.py
+
+#==================================#
+### 1.0     Imports
+#==================================#
+import argparse
+import asyncio
+import csv
+import io
+import itertools
+import json
+import logging
+import math
+import random
+import re
+import struct
+import threading
+from datetime import datetime, timedelta, time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from time import monotonic, sleep
+
+import pytz
+import websockets
+
+kolkata_tz = pytz.timezone("Asia/Kolkata")
+
+#==================================#
+### 2.0     Configuration
+#==================================#
+# Every knob below can be set from the command line (see parse_args()); the
+# latency / reject / fill knobs can also be changed at runtime via POST /sim/config.
+sim_host = "127.0.0.1"
+sim_rest_port = 8800
+sim_feed_port = 8801
+
+# --- Instruments ---
+sim_exchange = "NSE"                 # EXCH_ID in the scrip master
+sim_underlying = "NIFTY"             # UNDERLYING_SYMBOL
+sim_underlying_id = 13               # tracked instrument security id
+sim_underlying_instrument = "INDEX"  # INDEX / FUTIDX / FUTCOM (what auto_config() resolves the segment from)
+sim_underlying_segment = "IDX_I"
+sim_option_segment = "NSE_FNO"
+sim_start_price = 24000.0
+sim_strike_step = 50
+sim_strikes_each_side = 40           # chain width around the starting ATM strike
+sim_lot_size = 75
+sim_option_id_base = 40000           # option security ids are allocated from here
+
+# --- Price path ---
+sim_tick_interval = 0.25             # s between price steps (one feed tick per changed instrument per step)
+sim_annual_vol = 0.20                # random-walk volatility (annualised)
+sim_seed = None                      # RNG seed for reproducible runs
+sim_path_file = None                 # CSV with a 'close' column, replayed one row per step instead of the walk
+sim_history_days = 3                 # previous sessions of generated 1-minute candles (SMA seeding, warm-up)
+sim_session = "09:15-15:30"          # IST trading hours used for the generated history and candle alignment
+sim_option_noise = 0.10              # ± ₹ jitter on option prices per step (keeps the chain ticking)
+sim_time_value_pct = 0.005           # ATM time value as a fraction of spot
+sim_time_value_width = 6             # strikes over which the time value decays
+
+# --- Exchange behaviour (runtime-tunable) ---
+sim_rest_latency_ms = 0.0            # mean latency added to every REST response
+sim_rest_jitter_ms = 0.0             # std-dev of that latency (gaussian, clipped at 0)
+sim_exchange_latency_ms = 50.0       # TRANSIT → PENDING: time before an order can match
+sim_feed_latency_ms = 0.0            # delay between a price step and its packets leaving the websocket
+sim_reject_rate = 0.0                # probability an accepted order is REJECTED by RMS
+sim_partial_fill_rate = 0.0          # probability a fill step fills only part of the remaining quantity
+sim_partial_fill_fraction = 0.5      # share of the remaining lots filled by a partial step (≥ 1 lot)
+sim_stats_interval = 60.0            # s between stats log lines
+
+_RUNTIME_KNOBS = ("sim_rest_latency_ms", "sim_rest_jitter_ms", "sim_exchange_latency_ms", "sim_feed_latency_ms",
+                  "sim_reject_rate", "sim_partial_fill_rate", "sim_partial_fill_fraction")
+
+SEGMENT_CODES = {"IDX_I": 0, "NSE_EQ": 1, "NSE_FNO": 2, "NSE_CURRENCY": 3,
+                 "BSE_EQ": 4, "MCX_COMM": 5, "BSE_CURRENCY": 7, "BSE_FNO": 8}
+TICK_SIZE = 0.05
+LTT_IST_OFFSET = 19800               # Dhan stamps LTT as IST wall-clock seconds
+
+_OPEN_STATUSES = {"TRANSIT", "PENDING", "PART_TRADED"}
+
+market = None                        # Market, created by main()
+engine = None                        # MatchingEngine, created by main()
+feed_clients = set()
+sim_stats = {"rest_requests": 0, "orders": 0, "fills": 0, "partial_fills": 0, "rejects": 0, "modifies": 0,
+             "cancels": 0, "steps": 0, "step_overruns": 0, "ticks_sent": 0, "feed_connects": 0,
+             "max_feed_queue": 0}
+_STATS_LOCK = threading.Lock()
+
+
+def bump(key, n=1):
+    with _STATS_LOCK:
+        sim_stats[key] += n
+
+
+def round_tick(price):
+    return round(max(TICK_SIZE, round(price / TICK_SIZE) * TICK_SIZE), 2)
+
+
+def now_str():
+    return datetime.now(kolkata_tz).strftime("%Y-%m-%d %H:%M:%S")
+
+
+def dhan_error(code, message, error_type="Order_Error"):
+    return {"errorType": error_type, "errorCode": code, "errorMessage": message}
+
+
+#==================================#
+### 3.0     Market (price path, chain, candles)
+#==================================#
+class SimInstrument:
+    """One tradable (or tracked) instrument and its current price."""
+
+    __slots__ = ("security_id", "segment", "symbol", "option_type", "strike", "lot_size", "ltp")
+
+    def __init__(self, security_id, segment, symbol, option_type=None, strike=None, lot_size=1, ltp=0.0):
+        self.security_id = security_id
+        self.segment = segment
+        self.symbol = symbol
+        self.option_type = option_type
+        self.strike = strike
+        self.lot_size = lot_size
+        self.ltp = ltp
+
+
+def next_weekly_expiry(today):
+    """First Thursday strictly after today (the system skips same-day expiries)."""
+    days = (3 - today.weekday()) % 7 or 7
+    return today + timedelta(days=days)
+
+
+def session_bounds():
+    """(open, close) datetime.time from sim_session ("HH:MM-HH:MM")."""
+    return tuple(time(*map(int, part.split(":"))) for part in sim_session.split("-"))
+
+
+def session_minutes(history_days, now):
+    """Epoch seconds of every 1-minute bar start for the previous sessions and today up to now."""
+    days, day = [], now.date()
+    while len(days) < history_days:
+        day -= timedelta(days=1)
+        if day.weekday() < 5:
+            days.append(day)
+    days.reverse()
+    if now.date().weekday() < 5:
+        days.append(now.date())
+    minutes = []
+    session_open, session_close = session_bounds()
+    for day in days:
+        t = kolkata_tz.localize(datetime.combine(day, session_open))
+        end = kolkata_tz.localize(datetime.combine(day, session_close))
+        end = min(end, now.replace(second=0, microsecond=0))
+        while t < end:
+            minutes.append(int(t.timestamp()))
+            t += timedelta(minutes=1)
+    return minutes
+
+
+def random_walk(start, step_vol, rng):
+    price = start
+    while True:
+        price = max(TICK_SIZE, price * math.exp(step_vol * rng.gauss(0.0, 1.0)))
+        yield price
+
+
+def replay_path(path_file):
+    with open(path_file, newline="") as fh:
+        closes = [float(r["close"]) for r in csv.DictReader(fh) if r.get("close") not in (None, "")]
+    if not closes:
+        raise ValueError(f"No 'close' values in {path_file}")
+    return itertools.cycle(closes)
+
+
+class Market:
+    """Underlying price path, the option chain priced off it, and the underlying's minute candles."""
+
+    def __init__(self, rng):
+        self.rng = rng
+        self.lock = threading.RLock()          # shared with the matching engine
+        now = datetime.now(kolkata_tz)
+        self.expiry = next_weekly_expiry(now.date())
+        self.underlying = SimInstrument(sim_underlying_id, sim_underlying_segment, sim_underlying, ltp=sim_start_price)
+        self.instruments = {sim_underlying_id: self.underlying}
+        self.bars = {}                         # minute epoch -> [open, high, low, close, volume]
+
+        # 🕯️ History first, so the live path continues from the last generated close
+        minute_vol = sim_annual_vol / math.sqrt(252 * 375)
+        history = random_walk(sim_start_price, minute_vol, rng)
+        for minute in session_minutes(sim_history_days, now):
+            o = self.underlying.ltp
+            c = next(history)
+            hi = max(o, c) * (1 + abs(rng.gauss(0.0, minute_vol / 2)))
+            lo = min(o, c) * (1 - abs(rng.gauss(0.0, minute_vol / 2)))
+            self.bars[minute] = [o, hi, lo, c, rng.randint(1000, 5000)]
+            self.underlying.ltp = c
+        self.underlying.ltp = round_tick(self.underlying.ltp)
+
+        self.step_vol = sim_annual_vol * math.sqrt(sim_tick_interval / (252 * 375 * 60))
+        if sim_path_file:
+            self.path = replay_path(sim_path_file)
+        else:
+            self.path = random_walk(self.underlying.ltp, self.step_vol, rng)
+
+        atm = round(self.underlying.ltp / sim_strike_step) * sim_strike_step
+        ids = itertools.count(sim_option_id_base)
+        for k in range(-sim_strikes_each_side, sim_strikes_each_side + 1):
+            strike = atm + k * sim_strike_step
+            for option_type in ("CE", "PE"):
+                sid = next(ids)
+                symbol = f"{sim_underlying}-{self.expiry:%b%Y}-{strike:g}-{option_type}"
+                inst = SimInstrument(sid, sim_option_segment, symbol, option_type, strike, sim_lot_size)
+                inst.ltp = self.option_price(inst, self.underlying.ltp, noise=False)
+                self.instruments[sid] = inst
+        logging.info("🏦 Market: %s spot=%.2f | %d options (%g–%g, expiry %s) | %d history bars",
+                     sim_underlying, self.underlying.ltp, len(self.instruments) - 1,
+                     atm - sim_strikes_each_side * sim_strike_step, atm + sim_strikes_each_side * sim_strike_step,
+                     self.expiry, len(self.bars))
+
+    def option_price(self, inst, spot, noise=True):
+        intrinsic = max(0.0, spot - inst.strike) if inst.option_type == "CE" else max(0.0, inst.strike - spot)
+        distance = (spot - inst.strike) / (sim_time_value_width * sim_strike_step)
+        value = intrinsic + spot * sim_time_value_pct * math.exp(-distance * distance)
+        if noise and sim_option_noise:
+            value += self.rng.uniform(-sim_option_noise, sim_option_noise)
+        return round_tick(value)
+
+    def _record_bar(self, price):
+        minute = int(datetime.now(kolkata_tz).timestamp()) // 60 * 60
+        bar = self.bars.get(minute)
+        if bar is None:
+            self.bars[minute] = [price, price, price, price, self.rng.randint(10, 100)]
+        else:
+            bar[1] = max(bar[1], price)
+            bar[2] = min(bar[2], price)
+            bar[3] = price
+            bar[4] += self.rng.randint(10, 100)
+
+    def step(self, spot=None):
+        """Advance (or set) the underlying and reprice the chain. Returns the instruments whose LTP changed."""
+        with self.lock:
+            if spot is None:
+                spot = next(self.path)
+            elif not sim_path_file:
+                self.path = random_walk(spot, self.step_vol, self.rng)   # the walk continues from the forced price
+            spot = round_tick(spot)
+            changed = []
+            if spot != self.underlying.ltp:
+                self.underlying.ltp = spot
+                changed.append(self.underlying)
+            self._record_bar(spot)
+            for inst in self.instruments.values():
+                if inst.option_type is None:
+                    continue
+                price = self.option_price(inst, spot)
+                if price != inst.ltp:
+                    inst.ltp = price
+                    changed.append(inst)
+            return changed
+
+    def candles(self, from_epoch, to_epoch, interval):
+        """Dhan intraday payload (dict of lists) aggregated to `interval` minutes, aligned to the session open."""
+        out = {"open": [], "high": [], "low": [], "close": [], "volume": [], "timestamp": []}
+        with self.lock:
+            minutes = sorted(m for m in self.bars if from_epoch <= m <= to_epoch)
+            session_open = session_bounds()[0]
+            buckets = {}
+            for m in minutes:
+                day_open = kolkata_tz.localize(datetime.combine(
+                    datetime.fromtimestamp(m, kolkata_tz).date(), session_open)).timestamp()
+                key = int(day_open + (m - day_open) // (interval * 60) * interval * 60)
+                o, hi, lo, c, v = self.bars[m]
+                agg = buckets.get(key)
+                if agg is None:
+                    buckets[key] = [o, hi, lo, c, v]
+                else:
+                    agg[1], agg[2], agg[3], agg[4] = max(agg[1], hi), min(agg[2], lo), c, agg[4] + v
+        for key in sorted(buckets):
+            o, hi, lo, c, v = buckets[key]
+            out["open"].append(round(o, 2))
+            out["high"].append(round(hi, 2))
+            out["low"].append(round(lo, 2))
+            out["close"].append(round(c, 2))
+            out["volume"].append(v)
+            out["timestamp"].append(key)
+        return out
+
+    def scrip_master_csv(self):
+        """Synthetic api-scrip-master-detailed.csv: the underlying row, then the weekly option chain."""
+        buf = io.StringIO()
+        cols = ["EXCH_ID", "SEGMENT", "SECURITY_ID", "INSTRUMENT", "INSTRUMENT_TYPE", "UNDERLYING_SECURITY_ID",
+                "UNDERLYING_SYMBOL", "SYMBOL_NAME", "DISPLAY_NAME", "LOT_SIZE", "SM_EXPIRY_DATE",
+                "STRIKE_PRICE", "OPTION_TYPE", "TICK_SIZE"]
+        writer = csv.writer(buf)
+        writer.writerow(cols)
+        index = sim_underlying_instrument == "INDEX"
+        derivative_segment = "M" if sim_exchange == "MCX" else "D"
+        writer.writerow([sim_exchange, "I" if index else derivative_segment, sim_underlying_id,
+                         sim_underlying_instrument, sim_underlying_instrument, sim_underlying_id, sim_underlying,
+                         sim_underlying, sim_underlying, 1, "" if index else f"{self.expiry:%Y-%m-%d} 14:30:00",
+                         -0.01, "XX", TICK_SIZE])
+        for inst in self.instruments.values():
+            if inst.option_type is None:
+                continue
+            writer.writerow([sim_exchange, derivative_segment, inst.security_id, "OPTIDX" if index else "OPTFUT",
+                             "OP", sim_underlying_id, sim_underlying,
+                             inst.symbol, f"{sim_underlying} {self.expiry:%d %b} {inst.strike:g} {inst.option_type}",
+                             inst.lot_size, f"{self.expiry:%Y-%m-%d} 14:30:00", inst.strike, inst.option_type,
+                             TICK_SIZE])
+        return buf.getvalue()
+
+
+#==================================#
+### 4.0     Matching Engine
+#==================================#
+# Orders enter as TRANSIT and become matchable (PENDING) after
+# sim_exchange_latency_ms. Each price step matches every open order on the
+# stepped instruments:
+#   • LIMIT       BUY ltp ≤ price / SELL ltp ≥ price, filled at ltp
+#   • MARKET      filled at ltp
+#   • STOP_LOSS   triggers at ltp ≤ trigger (SELL) / ≥ trigger (BUY), then works as LIMIT at price
+#   • STOP_LOSS_MARKET / super-order STOP_LOSS_LEG: triggers likewise, filled at ltp
+# Super orders: the STOP_LOSS_LEG and TARGET_LEG protect whatever the entry has
+# filled and are one-cancels-other; when the exposure is flat the parent is CLOSED.
+_order_ids = itertools.count(int(datetime.now(kolkata_tz).strftime("%y%m%d")) * 10 ** 6 + 1)
+
+
+class SimOrder:
+    """One order on the simulated book: a normal order or one leg of a super order."""
+
+    __slots__ = ("order_id", "parent", "leg_name", "inst", "transaction_type", "order_type", "product_type",
+                 "validity", "quantity", "filled_qty", "traded_value", "price", "trigger_price", "triggered",
+                 "status", "eligible_at", "create_time", "update_time", "error", "correlation_id")
+
+    def __init__(self, inst, transaction_type, order_type, quantity, price=0.0, trigger_price=0.0,
+                 product_type="INTRADAY", leg_name=None, parent=None, correlation_id=""):
+        self.order_id = str(next(_order_ids))
+        self.parent = parent
+        self.leg_name = leg_name
+        self.inst = inst
+        self.transaction_type = transaction_type
+        self.order_type = order_type
+        self.product_type = product_type
+        self.validity = "DAY"
+        self.quantity = int(quantity)
+        self.filled_qty = 0
+        self.traded_value = 0.0
+        self.price = float(price or 0.0)
+        self.trigger_price = float(trigger_price or 0.0)
+        self.triggered = order_type in ("LIMIT", "MARKET")
+        self.status = "TRANSIT"
+        self.eligible_at = monotonic() + sim_exchange_latency_ms / 1000.0
+        self.create_time = self.update_time = now_str()
+        self.error = ""
+        self.correlation_id = correlation_id
+
+    @property
+    def remaining(self):
+        return self.quantity - self.filled_qty
+
+    @property
+    def avg_price(self):
+        return round(self.traded_value / self.filled_qty, 2) if self.filled_qty else 0.0
+
+    @property
+    def is_open(self):
+        return self.status in _OPEN_STATUSES
+
+    def set_status(self, status, error=""):
+        self.status = status
+        self.update_time = now_str()
+        if error:
+            self.error = error
+
+    def row(self):
+        """Dhan order-book row (/v2/orders)."""
+        inst = self.inst
+        return {
+            "dhanClientId": engine.client_id,
+            "orderId": self.order_id,
+            "exchangeOrderId": f"1{self.order_id}",
+            "correlationId": self.correlation_id,
+            "orderStatus": self.status,
+            "transactionType": self.transaction_type,
+            "exchangeSegment": inst.segment,
+            "productType": self.product_type,
+            "orderType": self.order_type,
+            "validity": self.validity,
+            "tradingSymbol": inst.symbol,
+            "securityId": str(inst.security_id),
+            "quantity": self.quantity,
+            "disclosedQuantity": 0,
+            "price": self.price,
+            "triggerPrice": self.trigger_price,
+            "afterMarketOrder": False,
+            "legName": self.leg_name or "NA",
+            "createTime": self.create_time,
+            "updateTime": self.update_time,
+            "exchangeTime": self.update_time if self.status not in ("TRANSIT", "REJECTED") else "0001-01-01 00:00:00",
+            "drvExpiryDate": f"{market.expiry:%Y-%m-%d} 14:30:00" if inst.option_type else "0001-01-01 00:00:00",
+            "drvOptionType": {"CE": "CALL", "PE": "PUT"}.get(inst.option_type, "NA"),
+            "drvStrikePrice": inst.strike or 0.0,
+            "omsErrorCode": "" if not self.error else "RMS",
+            "omsErrorDescription": self.error,
+            "remainingQuantity": self.remaining,
+            "averageTradedPrice": self.avg_price,
+            "filledQty": self.filled_qty,
+        }
+
+
+class SimSuperOrder:
+    """ENTRY_LEG (BUY LIMIT) plus STOP_LOSS_LEG / TARGET_LEG sized to the filled entry quantity."""
+
+    def __init__(self, inst, body):
+        self.entry = SimOrder(inst, body.get("transactionType", "BUY"), body.get("orderType", "LIMIT"),
+                              body["quantity"], body.get("price"), product_type=body.get("productType", "INTRADAY"),
+                              leg_name="ENTRY_LEG", parent=self, correlation_id=body.get("correlationId", ""))
+        exit_side = "SELL" if self.entry.transaction_type == "BUY" else "BUY"
+        self.sl = SimOrder(inst, exit_side, "STOP_LOSS_MARKET", 0, trigger_price=body["stopLossPrice"],
+                           leg_name="STOP_LOSS_LEG", parent=self)
+        self.sl.price = float(body["stopLossPrice"])
+        self.sl.triggered = False
+        self.target = SimOrder(inst, exit_side, "LIMIT", 0, body["targetPrice"], leg_name="TARGET_LEG", parent=self)
+        self.trailing_jump = float(body.get("trailingJump") or 0.0)
+        self.sl.status = self.target.status = "PENDING"
+
+    @property
+    def order_id(self):
+        return self.entry.order_id
+
+    @property
+    def inst(self):
+        return self.entry.inst
+
+    @property
+    def legs(self):
+        return (self.entry, self.sl, self.target)
+
+    @property
+    def is_open(self):
+        return any(leg.is_open for leg in self.legs)
+
+    def leg(self, name):
+        return {"ENTRY_LEG": self.entry, "STOP_LOSS_LEG": self.sl, "TARGET_LEG": self.target}.get(name)
+
+    @property
+    def exposure(self):
+        return self.entry.filled_qty - self.sl.filled_qty - self.target.filled_qty
+
+    @property
+    def status(self):
+        entry = self.entry
+        if entry.filled_qty == 0:
+            return entry.status
+        if self.exposure == 0 and not entry.is_open:
+            return "CLOSED"
+        return entry.status
+
+    def row(self):
+        row = self.entry.row()
+        row["orderStatus"] = self.status
+        row["legDetails"] = [{
+            "orderId": leg.order_id,
+            "legName": leg.leg_name,
+            "transactionType": leg.transaction_type,
+            "totalQuatity": leg.quantity,
+            "remainingQuantity": leg.remaining,
+            "triggeredQuantity": leg.filled_qty,
+            "price": leg.price,
+            "orderStatus": leg.status,
+            "trailingJump": self.trailing_jump,
+        } for leg in (self.sl, self.target)]
+        return row
+
+
+class MatchingEngine:
+    """Order books, positions and price-step matching (all state guarded by market.lock)."""
+
+    def __init__(self, market, rng, client_id="1000000001"):
+        self.market = market
+        self.rng = rng
+        self.client_id = client_id
+        self.super_orders = {}       # orderId -> SimSuperOrder
+        self.orders = {}             # orderId -> SimOrder (normal orders)
+        self.legs = {}               # any orderId (normal, entry, SL, target) -> SimOrder
+        self.open_by_sid = {}        # security_id -> {orderId: SimOrder | SimSuperOrder} with a leg still open
+        self.positions = {}          # security_id -> [buy_qty, buy_value, sell_qty, sell_value]
+
+    # ---------- helpers ----------
+    def _index(self, unit):
+        """Track a normal or super order for matching while any of its legs is open."""
+        if unit.is_open:
+            self.open_by_sid.setdefault(unit.inst.security_id, {})[unit.order_id] = unit
+
+    def _unindex(self, unit):
+        """Drop a normal or super order from the open index once nothing on it can fill."""
+        if unit.is_open:
+            return
+        book = self.open_by_sid.get(unit.inst.security_id)
+        if book is not None:
+            book.pop(unit.order_id, None)
+            if not book:
+                del self.open_by_sid[unit.inst.security_id]
+
+    def open_leg_count(self):
+        with self.market.lock:
+            return sum(1 for book in self.open_by_sid.values() for unit in book.values()
+                       for leg in getattr(unit, "legs", (unit,)) if leg.is_open)
+
+    def _instrument(self, body):
+        try:
+            return self.market.instruments.get(int(body.get("securityId")))
+        except (TypeError, ValueError):
+            return None
+
+    def _rms_reject(self, order):
+        if sim_reject_rate and self.rng.random() < sim_reject_rate:
+            order.set_status("REJECTED", "RMS:Margin Exceeds for the order")
+            bump("rejects")
+            logging.info("⛔ Rejected %s %s %s", order.order_id, order.leg_name or order.order_type, order.inst.symbol)
+            return True
+        return False
+
+    def _fill_qty(self, order):
+        remaining = order.remaining
+        lot = max(1, order.inst.lot_size)
+        lots = remaining // lot
+        if lots > 1 and sim_partial_fill_rate and self.rng.random() < sim_partial_fill_rate:
+            bump("partial_fills")
+            return max(1, int(lots * sim_partial_fill_fraction)) * lot
+        return remaining
+
+    def _fill(self, order, qty, price):
+        order.filled_qty += qty
+        order.traded_value += qty * price
+        order.set_status("TRADED" if order.remaining == 0 else "PART_TRADED")
+        pos = self.positions.setdefault(order.inst.security_id, [0, 0.0, 0, 0.0])
+        if order.transaction_type == "BUY":
+            pos[0] += qty
+            pos[1] += qty * price
+        else:
+            pos[2] += qty
+            pos[3] += qty * price
+        bump("fills")
+        logging.info("💥 Fill %s %s %s %d @ %.2f (%s)", order.order_id, order.leg_name or order.order_type,
+                     order.inst.symbol, qty, price, order.status)
+
+    def _marketable(self, order, ltp):
+        if not order.triggered:
+            hit = ltp <= order.trigger_price if order.transaction_type == "SELL" else ltp >= order.trigger_price
+            if not hit:
+                return False
+            order.triggered = True
+        if order.order_type in ("MARKET", "STOP_LOSS_MARKET"):
+            return True
+        return ltp <= order.price if order.transaction_type == "BUY" else ltp >= order.price
+
+    # ---------- price step ----------
+    def match(self, now):
+        """
+        Promote due TRANSIT orders and match the open ones against the current
+        prices. Only the open index is walked; terminal orders leave it here.
+        """
+        with self.market.lock:
+            for book in list(self.open_by_sid.values()):
+                for unit in list(book.values()):
+                    if isinstance(unit, SimSuperOrder):
+                        head = unit.entry
+                        if head.status == "TRANSIT" and now >= head.eligible_at:
+                            head.set_status("PENDING")
+                        self._match_super(unit)
+                    else:
+                        if unit.status == "TRANSIT" and now >= unit.eligible_at:
+                            unit.set_status("PENDING")
+                        if unit.status in ("PENDING", "PART_TRADED"):
+                            ltp = unit.inst.ltp
+                            if self._marketable(unit, ltp):
+                                self._fill(unit, self._fill_qty(unit), ltp)
+                    self._unindex(unit)
+
+    def _match_super(self, so):
+        entry, ltp = so.entry, so.entry.inst.ltp
+        if entry.status in ("PENDING", "PART_TRADED") and self._marketable(entry, ltp):
+            self._fill(entry, self._fill_qty(entry), ltp)
+            so.sl.quantity = so.target.quantity = entry.filled_qty
+        if so.exposure <= 0:
+            return
+        for leg, other in ((so.sl, so.target), (so.target, so.sl)):
+            if leg.status in ("PENDING", "PART_TRADED") and leg.remaining > 0 and self._marketable(leg, ltp):
+                qty = min(self._fill_qty(leg), so.exposure)
+                self._fill(leg, qty, ltp)
+                # One-cancels-other: the sibling now protects only what is left
+                other.quantity = max(other.filled_qty, other.quantity - qty)
+                if so.exposure == 0:
+                    if entry.is_open:
+                        entry.quantity = entry.filled_qty
+                        entry.set_status("TRADED")
+                    for sibling in (so.sl, so.target):
+                        if sibling.is_open:
+                            sibling.set_status("CANCELLED" if sibling.filled_qty == 0 else "TRADED")
+                    leg.set_status("TRADED")
+                    logging.info("🏁 Super order %s CLOSED via %s @ %.2f", so.order_id, leg.leg_name, ltp)
+                break
+
+    # ---------- super orders ----------
+    def place_super(self, body):
+        inst = self._instrument(body)
+        if inst is None:
+            return 400, dhan_error("DH-905", "Invalid SecurityId")
+        try:
+            so = SimSuperOrder(inst, body)
+        except (KeyError, TypeError, ValueError) as e:
+            return 400, dhan_error("DH-905", f"Missing or invalid field: {e}", "Input_Exception")
+        if so.entry.quantity <= 0 or so.entry.quantity % inst.lot_size:
+            return 400, dhan_error("DH-905", f"Quantity must be a multiple of lot size {inst.lot_size}",
+                                   "Input_Exception")
+        with self.market.lock:
+            self.super_orders[so.order_id] = so
+            self.legs[so.entry.order_id] = so.entry
+            self.legs[so.sl.order_id] = so.sl
+            self.legs[so.target.order_id] = so.target
+            if self._rms_reject(so.entry):
+                so.sl.set_status("CANCELLED")
+                so.target.set_status("CANCELLED")
+            self._index(so)
+        bump("orders")
+        logging.info("📥 Super order %s %s %s x%d @ %.2f | SL %.2f | TGT %.2f", so.order_id,
+                     so.entry.transaction_type, inst.symbol, so.entry.quantity, so.entry.price,
+                     so.sl.trigger_price, so.target.price)
+        return 200, {"orderId": so.order_id, "orderStatus": so.status}
+
+    def modify_super(self, order_id, body):
+        with self.market.lock:
+            so = self.super_orders.get(order_id)
+            if so is None:
+                return 404, dhan_error("DH-906", "Order not found")
+            leg_name = body.get("legName")
+            leg = so.leg(leg_name)
+            if leg is None:
+                return 400, dhan_error("DH-905", f"Invalid legName {leg_name}", "Input_Exception")
+            if not leg.is_open:
+                return 400, dhan_error("DH-906", f"Order is not open ({leg.status})")
+            ltp = leg.inst.ltp
+            if leg_name == "ENTRY_LEG":
+                if so.entry.filled_qty > 0:
+                    return 400, dhan_error("DH-906", f"Entry leg already traded ({so.entry.filled_qty} filled)")
+                if body.get("price") is not None:
+                    leg.price = float(body["price"])
+                if body.get("quantity") is not None:
+                    leg.quantity = int(body["quantity"])
+                if body.get("targetPrice") is not None:
+                    so.target.price = float(body["targetPrice"])
+                if body.get("stopLossPrice") is not None:
+                    so.sl.trigger_price = so.sl.price = float(body["stopLossPrice"])
+            elif leg_name == "STOP_LOSS_LEG":
+                new_sl = float(body.get("stopLossPrice", leg.trigger_price))
+                if so.entry.transaction_type == "BUY" and new_sl >= ltp:
+                    return 400, dhan_error("DH-906", f"Stop loss price {new_sl:.2f} should be less than LTP {ltp:.2f}")
+                leg.trigger_price = leg.price = new_sl
+                if body.get("trailingJump") is not None:
+                    so.trailing_jump = float(body["trailingJump"])
+            else:
+                leg.price = float(body.get("targetPrice", leg.price))
+            leg.update_time = now_str()
+        bump("modifies")
+        logging.info("✏️ Modified %s %s → %s", order_id, leg_name,
+                     {k: v for k, v in body.items() if k not in ("dhanClientId", "orderId", "legName")})
+        return 200, {"orderId": order_id, "orderStatus": so.status}
+
+    def cancel_super_leg(self, order_id, leg_name):
+        with self.market.lock:
+            so = self.super_orders.get(order_id)
+            if so is None:
+                return 404, dhan_error("DH-906", "Order not found")
+            leg = so.leg(leg_name)
+            if leg is None:
+                return 400, dhan_error("DH-905", f"Invalid leg {leg_name}", "Input_Exception")
+            if leg_name == "ENTRY_LEG":
+                if so.entry.filled_qty > 0:
+                    return 400, dhan_error("DH-906", "Order already traded — cancel the exit legs instead")
+                if not so.entry.is_open:
+                    return 400, dhan_error("DH-906", f"Order already {so.entry.status.lower()}")
+                for each in (so.entry, so.sl, so.target):
+                    if each.is_open:
+                        each.set_status("CANCELLED")
+            else:
+                if not leg.is_open:
+                    return 400, dhan_error("DH-906", f"Order already {leg.status.lower()}")
+                leg.set_status("CANCELLED")
+            self._unindex(so)
+        bump("cancels")
+        logging.info("🗑️ Cancelled %s %s", order_id, leg_name)
+        return 200, {"orderId": order_id, "orderStatus": "CANCELLED"}
+
+    # ---------- normal orders ----------
+    def place_order(self, body):
+        inst = self._instrument(body)
+        if inst is None:
+            return 400, dhan_error("DH-905", "Invalid SecurityId")
+        order_type = body.get("orderType", "LIMIT")
+        if order_type not in ("LIMIT", "MARKET", "STOP_LOSS", "STOP_LOSS_MARKET"):
+            return 400, dhan_error("DH-905", f"Invalid orderType {order_type}", "Input_Exception")
+        try:
+            order = SimOrder(inst, body["transactionType"], order_type, body["quantity"], body.get("price"),
+                             body.get("triggerPrice"), body.get("productType", "INTRADAY"),
+                             correlation_id=body.get("correlationId", ""))
+        except (KeyError, TypeError, ValueError) as e:
+            return 400, dhan_error("DH-905", f"Missing or invalid field: {e}", "Input_Exception")
+        with self.market.lock:
+            self.orders[order.order_id] = order
+            self.legs[order.order_id] = order
+            ltp = inst.ltp
+            if not self._rms_reject(order) and order_type.startswith("STOP_LOSS"):
+                wrong_side = (order.trigger_price >= ltp) if order.transaction_type == "SELL" else (order.trigger_price <= ltp)
+                if wrong_side:
+                    order.set_status("REJECTED", f"Trigger price {order.trigger_price:.2f} on the wrong side of LTP {ltp:.2f}")
+                    bump("rejects")
+            self._index(order)
+        bump("orders")
+        logging.info("📥 Order %s %s %s %s x%d @ %.2f trg %.2f → %s", order.order_id, order.transaction_type,
+                     order_type, inst.symbol, order.quantity, order.price, order.trigger_price, order.status)
+        return 200, {"orderId": order.order_id, "orderStatus": order.status}
+
+    def modify_order(self, order_id, body):
+        with self.market.lock:
+            order = self.orders.get(order_id)
+            if order is None:
+                return 404, dhan_error("DH-906", "Order not found")
+            if not order.is_open:
+                return 400, dhan_error("DH-906", f"Order is not open ({order.status})")
+            if body.get("orderType"):
+                order.order_type = body["orderType"]
+            if body.get("quantity") is not None:
+                order.quantity = max(order.filled_qty, int(body["quantity"]))
+            if body.get("price") is not None:
+                order.price = float(body["price"])
+            if body.get("triggerPrice") is not None:
+                order.trigger_price = float(body["triggerPrice"])
+            order.update_time = now_str()
+        bump("modifies")
+        return 200, {"orderId": order_id, "orderStatus": order.status}
+
+    def cancel_order(self, order_id):
+        with self.market.lock:
+            order = self.orders.get(order_id)
+            if order is None:
+                return 404, dhan_error("DH-906", "Order not found")
+            if not order.is_open:
+                return 400, dhan_error("DH-906", f"Order already {order.status.lower()}")
+            order.set_status("CANCELLED")
+            self._unindex(order)
+        bump("cancels")
+        logging.info("🗑️ Cancelled order %s", order_id)
+        return 200, {"orderId": order_id, "orderStatus": "CANCELLED"}
+
+    # ---------- books ----------
+    def order_book(self):
+        with self.market.lock:
+            return [o.row() for o in self.orders.values()]
+
+    def super_order_book(self):
+        with self.market.lock:
+            return [so.row() for so in self.super_orders.values()]
+
+    def order_row(self, order_id):
+        """Single order by id: normal orders, super-order parents (entry leg) and their SL/target legs."""
+        with self.market.lock:
+            order = self.legs.get(order_id)
+            if order is None:
+                return None
+            row = order.row()
+            if order.parent is not None and order.leg_name == "ENTRY_LEG":
+                row["orderStatus"] = order.parent.status
+            return row
+
+    def position_rows(self):
+        rows = []
+        with self.market.lock:
+            for sid, (buy_qty, buy_value, sell_qty, sell_value) in self.positions.items():
+                inst = self.market.instruments[sid]
+                net = buy_qty - sell_qty
+                buy_avg = round(buy_value / buy_qty, 2) if buy_qty else 0.0
+                sell_avg = round(sell_value / sell_qty, 2) if sell_qty else 0.0
+                closed_qty = min(buy_qty, sell_qty)
+                rows.append({
+                    "dhanClientId": self.client_id,
+                    "tradingSymbol": inst.symbol,
+                    "securityId": str(sid),
+                    "positionType": "LONG" if net > 0 else "SHORT" if net < 0 else "CLOSED",
+                    "exchangeSegment": inst.segment,
+                    "productType": "INTRADAY",
+                    "buyAvg": buy_avg,
+                    "buyQty": buy_qty,
+                    "costPrice": sell_avg if net < 0 else buy_avg,
+                    "sellAvg": sell_avg,
+                    "sellQty": sell_qty,
+                    "netQty": net,
+                    "realizedProfit": round(closed_qty * (sell_avg - buy_avg), 2),
+                    "unrealizedProfit": round(net * (inst.ltp - (buy_avg if net > 0 else sell_avg)), 2),
+                    "drvExpiryDate": f"{market.expiry:%Y-%m-%d} 14:30:00" if inst.option_type else "0001-01-01",
+                    "drvOptionType": {"CE": "CALL", "PE": "PUT"}.get(inst.option_type, "NA"),
+                    "drvStrikePrice": inst.strike or 0.0,
+                })
+        return rows
+
+
+#==================================#
+### 5.0     REST Server
+#==================================#
+def _parse_ist(value):
+    for fmt in ("%Y-%m-%d %H:%M:%S", "%Y-%m-%d"):
+        try:
+            return int(kolkata_tz.localize(datetime.strptime(str(value), fmt)).timestamp())
+        except ValueError:
+            continue
+    raise ValueError(f"bad date {value!r}")
+
+
+def route_ltp(body):
+    data = {}
+    with market.lock:
+        for segment, ids in (body or {}).items():
+            quotes = data.setdefault(segment, {})
+            for sid in ids or ():
+                inst = market.instruments.get(int(sid))
+                if inst is not None and inst.segment == segment:
+                    quotes[str(inst.security_id)] = {"last_price": inst.ltp}
+    return 200, {"data": data, "status": "success"}
+
+
+def route_intraday(body):
+    try:
+        sid = int(body["securityId"])
+        interval = int(body.get("interval", 1))
+        from_epoch, to_epoch = _parse_ist(body["fromDate"]), _parse_ist(body["toDate"])
+    except (KeyError, TypeError, ValueError) as e:
+        return 400, dhan_error("DH-905", f"Missing or invalid field: {e}", "Input_Exception")
+    if sid != sim_underlying_id:
+        return 400, dhan_error("DH-907", "No data present", "Data_Error")
+    return 200, market.candles(from_epoch, to_epoch, interval)
+
+
+def route_sim_price(body):
+    changed = market.step(float(body["price"]))
+    engine.match(monotonic())
+    return 200, {"spot": market.underlying.ltp, "changed": len(changed)}
+
+
+def route_sim_config(body):
+    applied = {}
+    for key, value in (body or {}).items():
+        name = key if key.startswith("sim_") else f"sim_{key}"
+        if name in _RUNTIME_KNOBS:
+            globals()[name] = float(value)
+            applied[name] = float(value)
+    logging.info("⚙️ Runtime config: %s", applied)
+    return 200, applied
+
+
+def route_sim_stats(_body):
+    with _STATS_LOCK:
+        out = dict(sim_stats)
+    with market.lock:
+        out["spot"] = market.underlying.ltp
+    out["open_orders"] = engine.open_leg_count()
+    out["feed_clients"] = len(feed_clients)
+    return 200, out
+
+
+# (method, path regex, handler(body, **groups))
+ROUTES = [
+    ("POST", r"/v2/super/orders", lambda b: engine.place_super(b)),
+    ("GET", r"/v2/super/orders", lambda b: (200, engine.super_order_book())),
+    ("PUT", r"/v2/super/orders/(?P<order_id>[^/]+)", lambda b, order_id: engine.modify_super(order_id, b)),
+    ("DELETE", r"/v2/super/orders/(?P<order_id>[^/]+)/(?P<leg>[A-Z_]+)",
+     lambda b, order_id, leg: engine.cancel_super_leg(order_id, leg)),
+    ("POST", r"/v2/orders", lambda b: engine.place_order(b)),
+    ("GET", r"/v2/orders", lambda b: (200, engine.order_book())),
+    ("GET", r"/v2/orders/(?P<order_id>[^/]+)",
+     lambda b, order_id: (200, row) if (row := engine.order_row(order_id)) else (404, dhan_error("DH-906", "Order not found"))),
+    ("PUT", r"/v2/orders/(?P<order_id>[^/]+)", lambda b, order_id: engine.modify_order(order_id, b)),
+    ("DELETE", r"/v2/orders/(?P<order_id>[^/]+)", lambda b, order_id: engine.cancel_order(order_id)),
+    ("GET", r"/v2/positions", lambda b: (200, engine.position_rows())),
+    ("POST", r"/v2/marketfeed/ltp", route_ltp),
+    ("POST", r"/v2/charts/intraday", route_intraday),
+    ("GET", r"/sim/stats", route_sim_stats),
+    ("POST", r"/sim/price", route_sim_price),
+    ("POST", r"/sim/config", route_sim_config),
+]
+ROUTES = [(method, re.compile(f"^{pattern}/?$"), fn) for method, pattern, fn in ROUTES]
+_PUBLIC_PATHS = ("/sim/", "/api-data/")
+
+
+class DhanRequestHandler(BaseHTTPRequestHandler):
+    """Keep-alive JSON handler for the Dhan v2 routes (one thread per connection)."""
+
+    protocol_version = "HTTP/1.1"
+    server_version = "DhanSimulator/1.0"
+
+    def log_message(self, fmt, *args):
+        logging.debug("REST %s", fmt % args)
+
+    def _send(self, status, payload, content_type="application/json"):
+        raw = payload.encode() if isinstance(payload, str) else json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(raw)))
+        self.end_headers()
+        self.wfile.write(raw)
+
+    def _dispatch(self, method):
+        length = int(self.headers.get("Content-Length") or 0)
+        raw = self.rfile.read(length) if length else b""
+        bump("rest_requests")
+        if sim_rest_latency_ms or sim_rest_jitter_ms:
+            sleep(max(0.0, random.gauss(sim_rest_latency_ms, sim_rest_jitter_ms)) / 1000.0)
+
+        path = self.path.split("?", 1)[0]
+        if method == "GET" and path == "/api-data/api-scrip-master-detailed.csv":
+            return self._send(200, market.scrip_master_csv(), "text/csv")
+        if not path.startswith(_PUBLIC_PATHS) and not self.headers.get("access-token"):
+            return self._send(401, dhan_error("DH-901", "Client ID or user generated access token is invalid or expired.",
+                                              "Invalid_Authentication"))
+        try:
+            body = json.loads(raw) if raw else {}
+        except ValueError:
+            return self._send(400, dhan_error("DH-905", "Malformed JSON body", "Input_Exception"))
+
+        for route_method, pattern, fn in ROUTES:
+            if route_method != method:
+                continue
+            match = pattern.match(path)
+            if match:
+                try:
+                    status, payload = fn(body, **match.groupdict())
+                except Exception as e:
+                    logging.exception("❌ %s %s failed: %s", method, path, e)
+                    status, payload = 500, dhan_error("DH-908", str(e), "Internal_Server_Error")
+                return self._send(status, payload)
+        return self._send(404, dhan_error("DH-905", f"No route for {method} {path}", "Input_Exception"))
+
+    def do_GET(self):
+        self._dispatch("GET")
+
+    def do_POST(self):
+        self._dispatch("POST")
+
+    def do_PUT(self):
+        self._dispatch("PUT")
+
+    def do_DELETE(self):
+        self._dispatch("DELETE")
+
+
+def start_rest_server():
+    server = ThreadingHTTPServer((sim_host, sim_rest_port), DhanRequestHandler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name="dhan-sim-rest", daemon=True).start()
+    logging.info("🌐 REST on http://%s:%d", sim_host, server.server_address[1])
+    return server
+
+
+#==================================#
+### 6.0     Websocket Feed
+#==================================#
+def ticker_packet(inst, ltt):
+    """Dhan v2 Ticker packet: <BHBI header (FeedCode 2, length 16, segment, id) + <fI (LTP, LTT)."""
+    return struct.pack("<BHBIfI", 2, 16, SEGMENT_CODES.get(inst.segment, 0), inst.security_id, inst.ltp, ltt)
+
+
+class FeedClient:
+    """One websocket client: its subscription set and a paced outbound queue."""
+
+    def __init__(self, ws):
+        self.ws = ws
+        self.subs = set()                  # security ids
+        self.queue = asyncio.Queue()
+
+    def enqueue(self, due, packets):
+        self.queue.put_nowait((due, packets))
+        depth = self.queue.qsize()
+        if depth > sim_stats["max_feed_queue"]:
+            sim_stats["max_feed_queue"] = depth
+
+    async def sender(self):
+        while True:
+            due, packets = await self.queue.get()
+            delay = due - monotonic()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            for packet in packets:
+                await self.ws.send(packet)
+            bump("ticks_sent", len(packets))
+
+    def handle_request(self, req):
+        code = int(req.get("RequestCode", 0))
+        ids = []
+        for item in req.get("InstrumentList") or ():
+            try:
+                ids.append(int(item.get("SecurityId")))
+            except (TypeError, ValueError):
+                continue
+        if code in (15, 17, 21):
+            fresh = [i for i in ids if i in market.instruments and i not in self.subs]
+            self.subs.update(fresh)
+            # Dhan answers a subscribe with the current state of each instrument
+            ltt = int(datetime.now(kolkata_tz).timestamp()) + LTT_IST_OFFSET
+            with market.lock:
+                packets = [ticker_packet(market.instruments[i], ltt) for i in fresh]
+            if packets:
+                self.enqueue(monotonic(), packets)
+        elif code in (16, 18, 22):
+            self.subs.difference_update(ids)
+        return code
+
+
+async def feed_handler(ws, path=None):
+    client = FeedClient(ws)
+    feed_clients.add(client)
+    bump("feed_connects")
+    sender = asyncio.create_task(client.sender())
+    logging.info("🔌 Feed client connected (%d open)", len(feed_clients))
+    try:
+        async for message in ws:
+            if isinstance(message, (bytes, bytearray)):
+                continue                       # binary disconnect header from the SDK
+            try:
+                if client.handle_request(json.loads(message)) == 12:
+                    break
+            except (ValueError, AttributeError) as e:
+                logging.warning("⚠️ Bad feed request %r: %s", message[:200], e)
+    except websockets.ConnectionClosed:
+        pass
+    finally:
+        feed_clients.discard(client)
+        sender.cancel()
+        logging.info("🔌 Feed client gone (%d subscriptions, %d open)", len(client.subs), len(feed_clients))
+
+
+async def run_price_path():
+    """Step the price path every sim_tick_interval, match, and fan the changed prices out to subscribers."""
+    next_step = monotonic()
+    while True:
+        now = monotonic()
+        changed = market.step()
+        engine.match(now)
+        bump("steps")
+        if feed_clients and changed:
+            ltt = int(datetime.now(kolkata_tz).timestamp()) + LTT_IST_OFFSET
+            with market.lock:
+                packets = {inst.security_id: ticker_packet(inst, ltt) for inst in changed}
+            due = now + sim_feed_latency_ms / 1000.0
+            for client in list(feed_clients):
+                mine = [p for sid, p in packets.items() if sid in client.subs]
+                if mine:
+                    client.enqueue(due, mine)
+        next_step += sim_tick_interval
+        delay = next_step - monotonic()
+        if delay < 0:
+            bump("step_overruns")
+            next_step = monotonic()
+            delay = 0
+        await asyncio.sleep(delay)
+
+
+async def log_stats_periodically():
+    while True:
+        await asyncio.sleep(sim_stats_interval)
+        logging.info("📊 Simulator stats: %s", route_sim_stats(None)[1])
+
+
+#==================================#
+### 7.0     Entry Point
+#==================================#
+def parse_args(argv=None):
+    p = argparse.ArgumentParser(description="Local Dhan exchange simulator (REST + binary websocket feed).")
+    p.add_argument("--host", default=sim_host)
+    p.add_argument("--rest-port", type=int, default=sim_rest_port)
+    p.add_argument("--feed-port", type=int, default=sim_feed_port)
+    p.add_argument("--client-id", default="1000000001", help="dhanClientId echoed in order/position rows")
+    p.add_argument("--exchange", default=sim_exchange)
+    p.add_argument("--underlying", default=sim_underlying)
+    p.add_argument("--underlying-id", type=int, default=sim_underlying_id)
+    p.add_argument("--underlying-instrument", default=sim_underlying_instrument)
+    p.add_argument("--underlying-segment", default=sim_underlying_segment)
+    p.add_argument("--option-segment", default=sim_option_segment)
+    p.add_argument("--start-price", type=float, default=sim_start_price)
+    p.add_argument("--strike-step", type=float, default=sim_strike_step)
+    p.add_argument("--strikes-each-side", type=int, default=sim_strikes_each_side)
+    p.add_argument("--lot-size", type=int, default=sim_lot_size)
+    p.add_argument("--tick-interval", type=float, default=sim_tick_interval)
+    p.add_argument("--annual-vol", type=float, default=sim_annual_vol)
+    p.add_argument("--seed", type=int, default=sim_seed)
+    p.add_argument("--path-file", default=sim_path_file, help="CSV with a 'close' column to replay")
+    p.add_argument("--history-days", type=int, default=sim_history_days)
+    p.add_argument("--session", default=sim_session, help="IST trading hours, HH:MM-HH:MM")
+    p.add_argument("--option-noise", type=float, default=sim_option_noise)
+    p.add_argument("--rest-latency-ms", type=float, default=sim_rest_latency_ms)
+    p.add_argument("--rest-jitter-ms", type=float, default=sim_rest_jitter_ms)
+    p.add_argument("--exchange-latency-ms", type=float, default=sim_exchange_latency_ms)
+    p.add_argument("--feed-latency-ms", type=float, default=sim_feed_latency_ms)
+    p.add_argument("--reject-rate", type=float, default=sim_reject_rate)
+    p.add_argument("--partial-fill-rate", type=float, default=sim_partial_fill_rate)
+    p.add_argument("--partial-fill-fraction", type=float, default=sim_partial_fill_fraction)
+    p.add_argument("--stats-interval", type=float, default=sim_stats_interval)
+    p.add_argument("--log-level", default="INFO")
+    return p.parse_args(argv)
+
+
+def configure(args):
+    """Copy CLI values onto the module-level sim_* knobs."""
+    for key, value in vars(args).items():
+        name = f"sim_{key}"
+        if name in globals():
+            globals()[name] = value
+
+
+async def serve():
+    async with websockets.serve(feed_handler, sim_host, sim_feed_port, max_size=None):
+        logging.info("📡 Feed on ws://%s:%d (tick every %.3fs)", sim_host, sim_feed_port, sim_tick_interval)
+        await asyncio.gather(run_price_path(), log_stats_periodically())
+
+
+def main(argv=None):
+    global market, engine
+    args = parse_args(argv)
+    configure(args)
+    logging.basicConfig(level=getattr(logging, str(args.log_level).upper(), logging.INFO),
+                        format="%(asctime)s [%(levelname)s] %(message)s")
+    rng = random.Random(sim_seed)
+    market = Market(rng)
+    engine = MatchingEngine(market, rng, client_id=args.client_id)
+    server = start_rest_server()
+    try:
+        asyncio.run(serve())
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.shutdown()
+        logging.info("📊 Final simulator stats: %s", route_sim_stats(None)[1])
+
+
+if __name__ == "__main__":
+    main()